@@ -1,16 +1,25 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr, Field
+from typing import Annotated, List, Literal, Optional, Dict, Any
 import uuid
+import hashlib
+import time
 from datetime import datetime, timedelta
 import jwt
+import orjson
+from cachetools import TTLCache
 from passlib.context import CryptContext
 
 ROOT_DIR = Path(__file__).parent
@@ -18,22 +27,56 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,
+    serverSelectionTimeoutMS=3000,
+    connectTimeoutMS=2000,
+    retryWrites=True,
+    compressors="zstd,zlib"
+)
 db = client[os.environ['DB_NAME']]
 
 # Security
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+    bcrypt__rounds=10
+)
+# Password hashing runs off the event loop; argon2-cffi and bcrypt release the GIL
+password_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="password")
 SECRET_KEY = "task-flow-secret-key-change-in-production"
 ALGORITHM = "HS256"
+ACCESS_TOKEN_TTL = timedelta(hours=24)
+
+# Verified tokens -> (user dict, exp); short TTL bounds how long a deleted user stays valid
+_token_cache = TTLCache(maxsize=10000, ttl=30)
+# User id -> user dict, shared across tokens belonging to the same user
+_user_cache = TTLCache(maxsize=5000, ttl=60)
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Define role hierarchy
+Role = Literal[
+    "senior_manager",
+    "manager",
+    "team_lead",
+    "senior_architect",
+    "architect",
+    "senior_developer",
+    "developer",
+    "intern"
+]
+
 ROLE_HIERARCHY = {
     "senior_manager": 8,
     "manager": 7,
@@ -45,19 +88,34 @@ ROLE_HIERARCHY = {
     "intern": 1
 }
 
+# Roles each role may assign tasks to: seniors can assign to juniors, or same level (peer approval)
+ALLOWED_ASSIGNEES = {
+    role: frozenset(other for other, other_level in ROLE_HIERARCHY.items() if other_level <= level)
+    for role, level in ROLE_HIERARCHY.items()
+}
+
 # Define Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     email: str
     name: str
     role: str
+    role_level: int
     password_hash: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+# New emails are stored lowercased; accounts registered before that may be mixed-case
+RegisterEmail = Annotated[EmailStr, AfterValidator(normalize_email)]
+# Case-insensitive comparison for email lookups, backed by the email_ci index
+EMAIL_COLLATION = {"locale": "en", "strength": 2}
+
 class UserCreate(BaseModel):
-    email: str
+    email: RegisterEmail
     name: str
-    role: str
+    role: Role
     password: str
 
 class UserLogin(BaseModel):
@@ -65,6 +123,8 @@ class UserLogin(BaseModel):
     password: str
 
 class UserResponse(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     id: str
     email: str
     name: str
@@ -72,12 +132,16 @@ class UserResponse(BaseModel):
     role_level: int
     created_at: datetime
 
+# Mongo projection matching the UserResponse fields
+USER_RESPONSE_PROJECTION = {"_id": 0, **{field: 1 for field in UserResponse.model_fields}}
+
 class Task(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     description: str
     assigned_by: str  # user id
     assigned_to: str  # user id
+    participants: List[str] = []  # [assigned_by, assigned_to], indexed for lookups by user
     status: str = "assigned"
     priority: str = "medium"
     due_date: Optional[datetime] = None
@@ -85,6 +149,9 @@ class Task(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Mongo projection hiding the index-only participants field from responses
+TASK_RESPONSE_PROJECTION = {"_id": 0, "participants": 0}
+
 class TaskCreate(BaseModel):
     title: str
     description: str
@@ -109,63 +176,129 @@ class CommentCreate(BaseModel):
     text: str
 
 # Utility functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify, plain_password, hashed_password)
+
+class OrjsonJWT(jwt.PyJWT):
+    """PyJWT with the claims (de)serialized by orjson instead of json"""
+
+    def _encode_payload(self, payload, headers=None, json_encoder=None) -> bytes:
+        return orjson.dumps(payload)
+
+    def _decode_payload(self, decoded) -> dict:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+jwt_codec = OrjsonJWT()
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=24)
+    expire = datetime.utcnow() + ACCESS_TOKEN_TTL
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt_codec.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_user_by_id(user_id: str) -> Optional[dict]:
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if user is not None:
+            _user_cache[user_id] = user
+    return user
+
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Already resolved earlier in this request
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
+    token = credentials.credentials
+    token_hash = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(token_hash)
+    if cached is not None and cached[1] > time.time():
+        request.state.user = cached[0]
+        return cached[0]
+
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt_codec.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
+        # Always read the user fresh here so the token cache TTL alone bounds staleness
         user = await db.users.find_one({"id": user_id}, {"_id": 0})
         if user is None:
+            _user_cache.pop(user_id, None)
             raise HTTPException(status_code=401, detail="User not found")
+        _user_cache[user_id] = user
+        _token_cache[token_hash] = (user, payload["exp"])
+        request.state.user = user
         return user
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def can_assign_task(assigner_role: str, assignee_role: str) -> bool:
-    """Check if assigner can assign task to assignee based on hierarchy"""
-    assigner_level = ROLE_HIERARCHY.get(assigner_role, 0)
-    assignee_level = ROLE_HIERARCHY.get(assignee_role, 0)
-    
-    # Seniors can assign to juniors, or same level (peer approval)
-    return assigner_level >= assignee_level
+def task_access_filter(task_id: str, user_id: str) -> dict:
+    """Match the task only if the user assigned it or is assigned to it"""
+    return {
+        "id": task_id,
+        "participants": user_id
+    }
+
+def keyset_filter(field: str, before: Optional[datetime], before_id: Optional[str]) -> dict:
+    """Match documents after the (field, id) cursor in a (field desc, id desc) ordering"""
+    if before is None:
+        return {}
+    if before_id is None:
+        return {field: {"$lt": before}}
+    # Timestamps aren't unique, so ties on `field` are broken by id
+    return {
+        "$or": [
+            {field: {"$lt": before}},
+            {field: before, "id": {"$lt": before_id}}
+        ]
+    }
+
+async def raise_task_not_accessible(task_id: str):
+    """Tell apart a missing task from one the user has no access to"""
+    if await db.tasks.find_one({"id": task_id}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    raise HTTPException(status_code=403, detail="Access denied")
 
 # Authentication routes
 @api_router.post("/auth/register")
 async def register(user_data: UserCreate):
     # Check if user already exists
-    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
+    existing_user = await db.users.find_one(
+        {"email": user_data.email}, {"_id": 0}, collation=EMAIL_COLLATION
+    )
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Validate role
-    if user_data.role not in ROLE_HIERARCHY:
-        raise HTTPException(status_code=400, detail="Invalid role")
-    
     # Create user
     user = User(
         email=user_data.email,
         name=user_data.name,
         role=user_data.role,
-        password_hash=hash_password(user_data.password)
+        role_level=ROLE_HIERARCHY[user_data.role],
+        password_hash=await hash_password(user_data.password)
     )
     
-    await db.users.insert_one(user.dict())
+    user_dict = user.model_dump()
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create access token
     access_token = create_access_token(data={"sub": user.id})
@@ -173,73 +306,75 @@ async def register(user_data: UserCreate):
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": UserResponse(
-            id=user.id,
-            email=user.email,
-            name=user.name,
-            role=user.role,
-            role_level=ROLE_HIERARCHY[user.role],
-            created_at=user.created_at
-        )
+        "user": UserResponse.model_construct(**user_dict)
     }
 
 @api_router.post("/auth/login")
 async def login(login_data: UserLogin):
+    # Exact match first so legacy accounts that differ only by case stay
+    # reachable, then ignore case to match normalized and legacy emails alike
     user = await db.users.find_one({"email": login_data.email}, {"_id": 0})
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    if not user:
+        user = await db.users.find_one(
+            {"email": login_data.email.strip()}, {"_id": 0}, collation=EMAIL_COLLATION
+        )
+    if not user or not await verify_password(login_data.password, user["password_hash"]):
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
+    # Transparently upgrade legacy bcrypt hashes to argon2id
+    if pwd_context.needs_update(user["password_hash"]):
+        await db.users.update_one(
+            {"id": user["id"]},
+            {"$set": {"password_hash": await hash_password(login_data.password)}}
+        )
+    
     access_token = create_access_token(data={"sub": user["id"]})
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": UserResponse(
-            id=user["id"],
-            email=user["email"],
-            name=user["name"],
-            role=user["role"],
-            role_level=ROLE_HIERARCHY[user["role"]],
-            created_at=user["created_at"]
-        )
+        "user": UserResponse.model_construct(**user)
     }
 
 @api_router.get("/auth/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
-    return UserResponse(
-        id=current_user["id"],
-        email=current_user["email"],
-        name=current_user["name"],
-        role=current_user["role"],
-        role_level=ROLE_HIERARCHY[current_user["role"]],
-        created_at=current_user["created_at"]
-    )
+    return UserResponse.model_construct(**current_user)
 
 # User management routes
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_users(current_user: dict = Depends(get_current_user)):
-    users = await db.users.find({}, {"_id": 0}).to_list(1000)
-    return [
-        UserResponse(
-            id=user["id"],
-            email=user["email"],
-            name=user["name"],
-            role=user["role"],
-            role_level=ROLE_HIERARCHY[user["role"]],
-            created_at=user["created_at"]
-        ) for user in users
-    ]
+async def get_users(
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    # Keyset pagination: pass the last user's created_at and id as `before`/`before_id` for the next page
+    query = keyset_filter("created_at", before, before_id)
+    cursor = db.users.find(query, USER_RESPONSE_PROJECTION).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit)
+    
+    # Stream the JSON array one user at a time instead of materializing it
+    async def stream_users():
+        separator = b"["
+        async for user in cursor:
+            yield separator + orjson.dumps(user)
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+    
+    return StreamingResponse(stream_users(), media_type="application/json")
 
 # Task management routes
 @api_router.post("/tasks")
 async def create_task(task_data: TaskCreate, current_user: dict = Depends(get_current_user)):
-    # Get assignee user to check if assignment is allowed
-    assignee = await db.users.find_one({"id": task_data.assigned_to}, {"_id": 0})
+    # Fetch the assignee only if the hierarchy allows the assignment
+    assignee = await db.users.find_one(
+        {"id": task_data.assigned_to, "role": {"$in": list(ALLOWED_ASSIGNEES[current_user["role"]])}},
+        {"_id": 0}
+    )
     if not assignee:
-        raise HTTPException(status_code=404, detail="Assignee not found")
-    
-    # Check if current user can assign to this person
-    if not can_assign_task(current_user["role"], assignee["role"]):
+        if await get_user_by_id(task_data.assigned_to) is None:
+            raise HTTPException(status_code=404, detail="Assignee not found")
         raise HTTPException(status_code=403, detail="Cannot assign task to this user based on role hierarchy")
     
     task = Task(
@@ -247,45 +382,45 @@ async def create_task(task_data: TaskCreate, current_user: dict = Depends(get_cu
         description=task_data.description,
         assigned_by=current_user["id"],
         assigned_to=task_data.assigned_to,
+        participants=[current_user["id"], task_data.assigned_to],
         priority=task_data.priority,
         due_date=task_data.due_date
     )
     
-    await db.tasks.insert_one(task.dict())
-    return task
+    await db.tasks.insert_one(task.model_dump())
+    return task.model_dump(exclude={"participants"})
 
 @api_router.get("/tasks")
-async def get_tasks(current_user: dict = Depends(get_current_user)):
-    # Get tasks assigned to current user or assigned by current user
-    tasks = await db.tasks.find({
-        "$or": [
-            {"assigned_to": current_user["id"]},
-            {"assigned_by": current_user["id"]}
-        ]
-    }, {"_id": 0}).to_list(1000)
+async def get_tasks(
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    # Get tasks assigned to current user or assigned by current user, newest first.
+    # Keyset pagination: pass the last task's updated_at and id as `before`/`before_id` for the next page
+    query = {"participants": current_user["id"], **keyset_filter("updated_at", before, before_id)}
+    tasks = await db.tasks.find(query, TASK_RESPONSE_PROJECTION).sort(
+        [("updated_at", -1), ("id", -1)]
+    ).limit(limit).to_list(limit)
+    
+    # Populate user info with one query for every user referenced
+    user_ids = {task["assigned_by"] for task in tasks} | {task["assigned_to"] for task in tasks}
+    users = await db.users.find(
+        {"id": {"$in": list(user_ids)}},
+        {"_id": 0, "id": 1, "name": 1, "role": 1}
+    ).to_list(len(user_ids))
+    users_by_id = {user["id"]: user for user in users}
     
-    # Populate user info
     for task in tasks:
-        assigned_by_user = await db.users.find_one({"id": task["assigned_by"]}, {"_id": 0})
-        assigned_to_user = await db.users.find_one({"id": task["assigned_to"]}, {"_id": 0})
-        
-        task["assigned_by_user"] = {
-            "id": assigned_by_user["id"],
-            "name": assigned_by_user["name"],
-            "role": assigned_by_user["role"]
-        } if assigned_by_user else None
-        
-        task["assigned_to_user"] = {
-            "id": assigned_to_user["id"],
-            "name": assigned_to_user["name"],
-            "role": assigned_to_user["role"]
-        } if assigned_to_user else None
+        task["assigned_by_user"] = users_by_id.get(task["assigned_by"])
+        task["assigned_to_user"] = users_by_id.get(task["assigned_to"])
     
     return tasks
 
 @api_router.get("/tasks/{task_id}")
 async def get_task(task_id: str, current_user: dict = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    task = await db.tasks.find_one({"id": task_id}, TASK_RESPONSE_PROJECTION)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -294,8 +429,8 @@ async def get_task(task_id: str, current_user: dict = Depends(get_current_user))
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Populate user info
-    assigned_by_user = await db.users.find_one({"id": task["assigned_by"]}, {"_id": 0})
-    assigned_to_user = await db.users.find_one({"id": task["assigned_to"]}, {"_id": 0})
+    assigned_by_user = await get_user_by_id(task["assigned_by"])
+    assigned_to_user = await get_user_by_id(task["assigned_to"])
     
     task["assigned_by_user"] = {
         "id": assigned_by_user["id"],
@@ -313,44 +448,37 @@ async def get_task(task_id: str, current_user: dict = Depends(get_current_user))
 
 @api_router.patch("/tasks/{task_id}")
 async def update_task(task_id: str, task_update: TaskUpdate, current_user: dict = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Check if user has access to update this task
-    if task["assigned_to"] != current_user["id"] and task["assigned_by"] != current_user["id"]:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    update_data = {k: v for k, v in task_update.dict().items() if v is not None}
+    update_data = task_update.model_dump(exclude_none=True)
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.tasks.update_one({"id": task_id}, {"$set": update_data})
-    
-    updated_task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    # Only update if user has access to this task, returning the updated document
+    updated_task = await db.tasks.find_one_and_update(
+        task_access_filter(task_id, current_user["id"]),
+        {"$set": update_data},
+        projection=TASK_RESPONSE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_task:
+        await raise_task_not_accessible(task_id)
     return updated_task
 
 @api_router.post("/tasks/{task_id}/comments")
 async def add_comment(task_id: str, comment_data: CommentCreate, current_user: dict = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Check if user has access to this task
-    if task["assigned_to"] != current_user["id"] and task["assigned_by"] != current_user["id"]:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     comment = Comment(
         text=comment_data.text,
         author=current_user["id"]
     )
     
-    await db.tasks.update_one(
-        {"id": task_id},
+    # Only add the comment if user has access to this task
+    result = await db.tasks.update_one(
+        task_access_filter(task_id, current_user["id"]),
         {
-            "$push": {"comments": comment.dict()},
+            "$push": {"comments": comment.model_dump()},
             "$set": {"updated_at": datetime.utcnow()}
         }
     )
+    if result.matched_count == 0:
+        await raise_task_not_accessible(task_id)
     
     return comment
 
@@ -372,6 +500,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def warm_up_db_pool():
+    # Connect before the first request; minPoolSize keeps the pool filled from here
+    await db.command("ping")
+
+@app.on_event("startup")
+async def prepare_collections():
+    await db.users.create_index("email", unique=True)
+    await db.users.create_index("email", name="email_ci", collation=EMAIL_COLLATION)
+    await db.users.create_index("id", unique=True)
+    await db.users.create_index([("created_at", -1), ("id", -1)])
+    await db.tasks.create_index("id", unique=True)
+    await db.tasks.create_index([("participants", 1), ("updated_at", -1), ("id", -1)])
+
+    # Backfill role_level on users registered before it was stored
+    for role, level in ROLE_HIERARCHY.items():
+        await db.users.update_many(
+            {"role": role, "role_level": {"$exists": False}},
+            {"$set": {"role_level": level}}
+        )
+
+    # Backfill participants on tasks created before it was stored
+    await db.tasks.update_many(
+        {"participants": {"$exists": False}},
+        [{"$set": {"participants": ["$assigned_by", "$assigned_to"]}}]
+    )
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+    password_executor.shutdown(wait=False)
\ No newline at end of file
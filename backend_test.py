@@ -1,11 +1,14 @@
-import requests
+import asyncio
+import httpx
 import sys
+from urllib.parse import urlencode
 import json
 from datetime import datetime, timedelta
 import uuid
 
 class TaskFlowAPITester:
-    def __init__(self, base_url="https://taskmaster-261.preview.emergentagent.com/api"):
+    def __init__(self, client, base_url="https://taskmaster-261.preview.emergentagent.com/api"):
+        self.client = client  # shared httpx.AsyncClient, reuses keep-alive connections
         self.base_url = base_url
         self.tokens = {}  # Store tokens for different users
         self.users = {}   # Store user data
@@ -13,7 +16,7 @@ class TaskFlowAPITester:
         self.tests_run = 0
         self.tests_passed = 0
 
-    def run_test(self, name, method, endpoint, expected_status, data=None, token=None, description=""):
+    async def run_test(self, name, method, endpoint, expected_status, data=None, token=None, description=""):
         """Run a single API test"""
         url = f"{self.base_url}/{endpoint}"
         headers = {'Content-Type': 'application/json'}
@@ -21,42 +24,57 @@ class TaskFlowAPITester:
             headers['Authorization'] = f'Bearer {token}'
 
         self.tests_run += 1
-        print(f"\n🔍 Testing {name}...")
+        # Buffer output so tests running concurrently don't interleave their lines
+        output = [f"\n🔍 Testing {name}..."]
         if description:
-            print(f"   Description: {description}")
+            output.append(f"   Description: {description}")
         
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers, timeout=10)
+                response = await self.client.get(url, headers=headers)
             elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers, timeout=10)
+                response = await self.client.post(url, json=data, headers=headers)
             elif method == 'PATCH':
-                response = requests.patch(url, json=data, headers=headers, timeout=10)
+                response = await self.client.patch(url, json=data, headers=headers)
 
             success = response.status_code == expected_status
             if success:
                 self.tests_passed += 1
-                print(f"✅ Passed - Status: {response.status_code}")
+                output.append(f"✅ Passed - Status: {response.status_code}")
                 try:
                     return success, response.json()
                 except:
                     return success, {}
             else:
-                print(f"❌ Failed - Expected {expected_status}, got {response.status_code}")
+                output.append(f"❌ Failed - Expected {expected_status}, got {response.status_code}")
                 try:
                     error_detail = response.json()
-                    print(f"   Error: {error_detail}")
+                    output.append(f"   Error: {error_detail}")
                 except:
-                    print(f"   Response: {response.text}")
+                    output.append(f"   Response: {response.text}")
                 return False, {}
 
         except Exception as e:
-            print(f"❌ Failed - Error: {str(e)}")
+            output.append(f"❌ Failed - Error: {str(e)}")
             return False, {}
+        finally:
+            print("\n".join(output))
 
-    def test_user_registration(self, name, email, role, password):
+    def record_check(self, name, passed, detail=""):
+        """Record a check on already-fetched data as a test"""
+        self.tests_run += 1
+        if passed:
+            self.tests_passed += 1
+            print(f"✅ Passed - {name}")
+        else:
+            print(f"❌ Failed - {name}")
+            if detail:
+                print(f"   {detail}")
+        return passed
+
+    async def test_user_registration(self, name, email, role, password):
         """Test user registration"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             f"Register {role}",
             "POST",
             "auth/register",
@@ -80,13 +98,12 @@ class TaskFlowAPITester:
                 'role_level': response['user']['role_level'],
                 'token': response['access_token']
             }
-            print(f"   User ID: {user_id}, Role Level: {response['user']['role_level']}")
             return user_id
         return None
 
-    def test_user_login(self, email, password):
+    async def test_user_login(self, email, password):
         """Test user login"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "User Login",
             "POST",
             "auth/login",
@@ -99,9 +116,9 @@ class TaskFlowAPITester:
             return response['access_token'], response['user']
         return None, None
 
-    def test_get_current_user(self, token):
+    async def test_get_current_user(self, token):
         """Test get current user endpoint"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Current User",
             "GET",
             "auth/me",
@@ -111,9 +128,9 @@ class TaskFlowAPITester:
         )
         return success, response
 
-    def test_get_users(self, token):
+    async def test_get_users(self, token):
         """Test get all users endpoint"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get All Users",
             "GET",
             "users",
@@ -123,9 +140,9 @@ class TaskFlowAPITester:
         )
         return success, response
 
-    def test_create_task(self, assigner_token, assignee_id, title, description, priority="medium"):
+    async def test_create_task(self, assigner_token, assignee_id, title, description, priority="medium"):
         """Test task creation"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Task",
             "POST",
             "tasks",
@@ -146,9 +163,9 @@ class TaskFlowAPITester:
             return task_id
         return None
 
-    def test_create_task_invalid_hierarchy(self, assigner_token, assignee_id, title):
+    async def test_create_task_invalid_hierarchy(self, assigner_token, assignee_id, title):
         """Test task creation with invalid hierarchy (should fail)"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Task (Invalid Hierarchy)",
             "POST",
             "tasks",
@@ -164,9 +181,9 @@ class TaskFlowAPITester:
         )
         return success
 
-    def test_get_tasks(self, token):
+    async def test_get_tasks(self, token):
         """Test get tasks endpoint"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Tasks",
             "GET",
             "tasks",
@@ -176,9 +193,9 @@ class TaskFlowAPITester:
         )
         return success, response
 
-    def test_get_specific_task(self, task_id, token):
+    async def test_get_specific_task(self, task_id, token):
         """Test get specific task endpoint"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Specific Task",
             "GET",
             f"tasks/{task_id}",
@@ -188,9 +205,9 @@ class TaskFlowAPITester:
         )
         return success, response
 
-    def test_update_task_status(self, task_id, new_status, token):
+    async def test_update_task_status(self, task_id, new_status, token):
         """Test task status update"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Update Task Status",
             "PATCH",
             f"tasks/{task_id}",
@@ -201,9 +218,9 @@ class TaskFlowAPITester:
         )
         return success, response
 
-    def test_add_comment(self, task_id, comment_text, token):
+    async def test_add_comment(self, task_id, comment_text, token):
         """Test adding comment to task"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Add Comment",
             "POST",
             f"tasks/{task_id}/comments",
@@ -214,11 +231,51 @@ class TaskFlowAPITester:
         )
         return success, response
 
-def main():
+    async def test_paginate(self, endpoint, cursor_field, token, limit):
+        """Walk every page of a keyset-paginated list endpoint"""
+        items = []
+        params = {"limit": limit}
+        while True:
+            success, page = await self.run_test(
+                f"Paginate {endpoint}",
+                "GET",
+                f"{endpoint}?{urlencode(params)}",
+                200,
+                token=token,
+                description=f"Fetch page {len(items) // limit + 1} of {endpoint} with limit {limit}"
+            )
+            if not success:
+                return False, items
+            items.extend(page)
+            if len(page) < limit:
+                return True, items
+            params = {"limit": limit, "before": page[-1][cursor_field], "before_id": page[-1]["id"]}
+
+    async def test_cursor_tie(self, endpoint, cursor_field, item, token):
+        """Rows sharing the cursor timestamp must be split by id, not dropped"""
+        # "~" sorts after and "" before every uuid, so `item` itself sits on either side of the cursor
+        results = []
+        for before_id, expect_included in (("~", True), ("", False)):
+            params = {"limit": 1000, "before": item[cursor_field], "before_id": before_id}
+            success, page = await self.run_test(
+                f"Cursor Tie on {endpoint}",
+                "GET",
+                f"{endpoint}?{urlencode(params)}",
+                200,
+                token=token,
+                description=f"Page before ({item[cursor_field]}, {before_id!r}) should {'include' if expect_included else 'exclude'} {item['id']}"
+            )
+            results.append(success and (item["id"] in [row["id"] for row in page]) == expect_included)
+        return self.record_check(f"Cursor tie on {endpoint} splits equal timestamps by id", all(results))
+
+async def main():
     print("🚀 Starting TaskFlow API Testing...")
     print("=" * 60)
     
-    tester = TaskFlowAPITester()
+    async with httpx.AsyncClient(timeout=10, http2=True) as client:
+        return await run_tests(TaskFlowAPITester(client))
+
+async def run_tests(tester):
     
     # Test data
     timestamp = datetime.now().strftime('%H%M%S')
@@ -234,34 +291,40 @@ def main():
     print("\n📝 PHASE 1: User Registration & Authentication")
     print("-" * 50)
     
-    # Register users
-    user_ids = []
-    for name, email, role, password in test_users:
-        user_id = tester.test_user_registration(name, email, role, password)
-        if user_id:
-            user_ids.append(user_id)
-        else:
+    # Register users concurrently; gather keeps results in test_users order
+    user_ids = await asyncio.gather(*[
+        tester.test_user_registration(name, email, role, password)
+        for name, email, role, password in test_users
+    ])
+    for (name, _, _, _), user_id in zip(test_users, user_ids):
+        if not user_id:
             print(f"❌ Failed to register {name}")
             return 1
     
+    # Printed once the concurrent registrations finish so it can't interleave with their output
+    for user_id in user_ids:
+        user = tester.users[user_id]
+        print(f"   {user['name']} - User ID: {user_id}, Role Level: {user['role_level']}")
+    
     print(f"\n✅ Successfully registered {len(user_ids)} users")
     
     # Test login with first user
     first_user = test_users[0]
-    token, user_data = tester.test_user_login(first_user[1], first_user[3])
+    token, user_data = await tester.test_user_login(first_user[1], first_user[3])
     if not token:
         print("❌ Login test failed")
         return 1
     
-    # Test get current user
-    success, _ = tester.test_get_current_user(token)
+    # Test get current user and get all users
+    (success, _), (users_success, users_list) = await asyncio.gather(
+        tester.test_get_current_user(token),
+        tester.test_get_users(token)
+    )
     if not success:
         print("❌ Get current user failed")
         return 1
     
-    # Test get all users
-    success, users_list = tester.test_get_users(token)
-    if not success:
+    if not users_success:
         print("❌ Get users failed")
         return 1
     
@@ -281,41 +344,38 @@ def main():
     developer_token = tester.users[developer_id]['token']
     intern_token = tester.users[intern_id]['token']
     
-    # Test valid task assignments (senior to junior)
-    task1_id = tester.test_create_task(
-        senior_manager_token, 
-        manager_id, 
-        "Strategic Planning Task", 
-        "Plan Q1 strategy for the team"
-    )
-    
-    task2_id = tester.test_create_task(
-        manager_token, 
-        developer_id, 
-        "Feature Development", 
-        "Implement new user authentication feature"
-    )
-    
-    task3_id = tester.test_create_task(
-        developer_token, 
-        intern_id, 
-        "Code Review", 
-        "Review and test the authentication module"
-    )
-    
-    # Test invalid task assignment (junior to senior) - should fail
-    tester.test_create_task_invalid_hierarchy(
-        intern_token, 
-        senior_manager_id, 
-        "Invalid Task Assignment"
-    )
-    
-    # Test peer-level assignment (same role level)
-    task4_id = tester.test_create_task(
-        developer_token, 
-        developer_id,  # This should work as peer assignment
-        "Peer Review Task", 
-        "Review colleague's code implementation"
+    # Test valid task assignments (senior to junior), invalid assignment
+    # (junior to senior) and peer-level assignment (same role level)
+    task1_id, task2_id, task3_id, _, task4_id = await asyncio.gather(
+        tester.test_create_task(
+            senior_manager_token, 
+            manager_id, 
+            "Strategic Planning Task", 
+            "Plan Q1 strategy for the team"
+        ),
+        tester.test_create_task(
+            manager_token, 
+            developer_id, 
+            "Feature Development", 
+            "Implement new user authentication feature"
+        ),
+        tester.test_create_task(
+            developer_token, 
+            intern_id, 
+            "Code Review", 
+            "Review and test the authentication module"
+        ),
+        tester.test_create_task_invalid_hierarchy(
+            intern_token, 
+            senior_manager_id, 
+            "Invalid Task Assignment"
+        ),
+        tester.test_create_task(
+            developer_token, 
+            developer_id,  # This should work as peer assignment
+            "Peer Review Task", 
+            "Review colleague's code implementation"
+        )
     )
     
     if not all([task1_id, task2_id, task3_id]):
@@ -328,33 +388,35 @@ def main():
     print("-" * 50)
     
     # Test getting tasks for different users
-    success, manager_tasks = tester.test_get_tasks(manager_token)
+    (success, manager_tasks), (developer_success, developer_tasks) = await asyncio.gather(
+        tester.test_get_tasks(manager_token),
+        tester.test_get_tasks(developer_token)
+    )
     if success:
         print(f"✅ Manager has {len(manager_tasks)} tasks")
     
-    success, developer_tasks = tester.test_get_tasks(developer_token)
-    if success:
+    if developer_success:
         print(f"✅ Developer has {len(developer_tasks)} tasks")
     
     # Test getting specific task
     if task1_id:
-        success, task_details = tester.test_get_specific_task(task1_id, manager_token)
+        success, task_details = await tester.test_get_specific_task(task1_id, manager_token)
         if success:
             print(f"✅ Retrieved task details: {task_details.get('title', 'Unknown')}")
     
     # Test task status updates
     if task2_id:
-        success, _ = tester.test_update_task_status(task2_id, "in_progress", developer_token)
+        success, _ = await tester.test_update_task_status(task2_id, "in_progress", developer_token)
         if success:
             print("✅ Updated task status to in_progress")
         
-        success, _ = tester.test_update_task_status(task2_id, "completed", developer_token)
+        success, _ = await tester.test_update_task_status(task2_id, "completed", developer_token)
         if success:
             print("✅ Updated task status to completed")
     
     # Test adding comments
     if task1_id:
-        success, _ = tester.test_add_comment(
+        success, _ = await tester.test_add_comment(
             task1_id, 
             "Started working on the strategic planning document", 
             manager_token
@@ -362,7 +424,7 @@ def main():
         if success:
             print("✅ Added comment to task")
         
-        success, _ = tester.test_add_comment(
+        success, _ = await tester.test_add_comment(
             task1_id, 
             "Please prioritize the Q1 objectives", 
             senior_manager_token
@@ -370,12 +432,61 @@ def main():
         if success:
             print("✅ Added second comment to task")
     
-    print("\n📊 PHASE 4: Final Verification")
+    print("\n📑 PHASE 4: Pagination & Response Shape")
+    print("-" * 50)
+    
+    # Tasks created concurrently commonly share an updated_at, the case keyset cursors must not skip
+    batch_ids = await asyncio.gather(*[
+        tester.test_create_task(developer_token, developer_id, f"Pagination Task {i}", "Keyset pagination check")
+        for i in range(4)
+    ])
+    
+    success, paged_tasks = await tester.test_paginate("tasks", "updated_at", developer_token, limit=2)
+    if success:
+        paged_ids = [task["id"] for task in paged_tasks]
+        expected_ids = {task2_id, task3_id, task4_id, *batch_ids} - {None}
+        tester.record_check(
+            "Task pages cover every task exactly once",
+            len(paged_ids) == len(set(paged_ids)) and expected_ids <= set(paged_ids),
+            f"Missing: {expected_ids - set(paged_ids)}, duplicates: {len(paged_ids) - len(set(paged_ids))}"
+        )
+        keys = [(task["updated_at"], task["id"]) for task in paged_tasks]
+        tester.record_check("Tasks are ordered newest first", keys == sorted(keys, reverse=True))
+        tester.record_check(
+            "Task list responses omit participants",
+            all("participants" not in task for task in paged_tasks)
+        )
+        if paged_tasks:
+            await tester.test_cursor_tie("tasks", "updated_at", paged_tasks[0], developer_token)
+    
+    success, paged_users = await tester.test_paginate("users", "created_at", developer_token, limit=2)
+    if success:
+        paged_ids = [user["id"] for user in paged_users]
+        tester.record_check(
+            "User pages cover every registered user exactly once",
+            len(paged_ids) == len(set(paged_ids)) and set(user_ids) <= set(paged_ids),
+            f"Missing: {set(user_ids) - set(paged_ids)}, duplicates: {len(paged_ids) - len(set(paged_ids))}"
+        )
+        registered = [user for user in paged_users if user["id"] in set(user_ids)]
+        if registered:
+            await tester.test_cursor_tie("users", "created_at", registered[0], developer_token)
+    
+    # participants is index-only and must not leak through any task response
+    if task2_id:
+        created_task = tester.tasks[task2_id]
+        _, fetched_task = await tester.test_get_specific_task(task2_id, developer_token)
+        _, updated_task = await tester.test_update_task_status(task2_id, "completed", developer_token)
+        tester.record_check(
+            "Create/get/update task responses omit participants",
+            all(task and "participants" not in task for task in (created_task, fetched_task, updated_task))
+        )
+    
+    print("\n📊 PHASE 5: Final Verification")
     print("-" * 50)
     
     # Verify final task states
     if task1_id:
-        success, final_task = tester.test_get_specific_task(task1_id, manager_token)
+        success, final_task = await tester.test_get_specific_task(task1_id, manager_token)
         if success:
             comments_count = len(final_task.get('comments', []))
             print(f"✅ Task has {comments_count} comments")
@@ -398,4 +509,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -17,6 +17,34 @@ import { Calendar as CalendarIcon, Plus, MessageSquare, Clock, User, CheckCircle
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PAGE_SIZE = 200;
+
+// List endpoints are keyset-paginated: keep passing the last item's sort key
+// and id as `before`/`before_id` until a short page comes back
+const fetchAllPages = async (url, cursorField) => {
+  const items = [];
+  let before;
+  let beforeId;
+  for (;;) {
+    const response = await axios.get(url, { params: { limit: PAGE_SIZE, before, before_id: beforeId } });
+    items.push(...response.data);
+    if (response.data.length < PAGE_SIZE) {
+      return items;
+    }
+    const last = response.data[response.data.length - 1];
+    before = last[cursorField];
+    beforeId = last.id;
+  }
+};
+
+// FastAPI validation errors (422) carry a list of {msg, ...} objects in `detail`
+const errorMessage = (error, fallback) => {
+  const detail = error.response?.data?.detail;
+  if (Array.isArray(detail)) {
+    return detail.map((item) => item.msg).join('; ') || fallback;
+  }
+  return detail || fallback;
+};
 
 // Context for authentication
 const AuthContext = createContext();
@@ -67,7 +95,7 @@ const AuthProvider = ({ children }) => {
       
       return { success: true };
     } catch (error) {
-      return { success: false, error: error.response?.data?.detail || 'Login failed' };
+      return { success: false, error: errorMessage(error, 'Login failed') };
     }
   };
 
@@ -83,7 +111,7 @@ const AuthProvider = ({ children }) => {
       
       return { success: true };
     } catch (error) {
-      return { success: false, error: error.response?.data?.detail || 'Registration failed' };
+      return { success: false, error: errorMessage(error, 'Registration failed') };
     }
   };
 
@@ -301,8 +329,7 @@ const Dashboard = () => {
 
   const fetchTasks = async () => {
     try {
-      const response = await axios.get(`${API}/tasks`);
-      setTasks(response.data);
+      setTasks(await fetchAllPages(`${API}/tasks`, 'updated_at'));
     } catch (error) {
       console.error('Failed to fetch tasks:', error);
     } finally {
@@ -312,8 +339,7 @@ const Dashboard = () => {
 
   const fetchUsers = async () => {
     try {
-      const response = await axios.get(`${API}/users`);
-      setUsers(response.data);
+      setUsers(await fetchAllPages(`${API}/users`, 'created_at'));
     } catch (error) {
       console.error('Failed to fetch users:', error);
     }